@@ -1,26 +1,79 @@
 import os
+import sys
+import ctypes
+import json
 import mido
 import zmq
 import time
 import threading
 import logging
+import logging.handlers
 import argparse
-from typing import Callable, Set, Dict, Optional, Any
+import atexit
+import queue
+import tempfile
+from typing import Callable, Dict, List, Optional, Any
 
-from core.music_theory import ChordTheory
+from core.music_theory import ChordTheory, midi_mask_to_pc_mask
 from utils.utils import resource_path
 
 # --- Constants ---
 DEFAULT_ZMQ_PUB_PORT = 5557
+ZMQ_TRANSPORTS = ("tcp", "ipc", "inproc")
+# inproc subscribers must live in the same process, which a standalone run never has
+CLI_ZMQ_TRANSPORTS = ("tcp", "ipc")
+DEFAULT_ZMQ_TRANSPORT = "tcp"
+ZMQ_INPROC_ENDPOINT = "inproc://chord-events"
+ZMQ_SEND_HWM = 1  # Chord updates are only useful while fresh; don't queue a backlog
 DEFAULT_MIN_NOTES_FOR_CHORD = 2
 DEFAULT_CHORD_BUFFER_TIME_ON = 0.015
 DEFAULT_CHORD_CONFIG_PATH = resource_path(os.path.join("data", "chord_definitions.json"))
 DEFAULT_LOG_LEVEL = "INFO"
+MIDI_THREAD_FIFO_PRIORITY = 20  # SCHED_FIFO priority requested for the MIDI thread (Linux)
+THREAD_PRIORITY_TIME_CRITICAL = 15  # Win32 SetThreadPriority level
+GIL_SWITCH_INTERVAL = 0.001  # Seconds; lets the MIDI thread get the GIL back sooner
+ERROR_TRACEBACK_INTERVAL = 1.0  # Seconds between full tracebacks logged from the MIDI thread
+
+# Built once: json.dumps() constructs a new encoder on every call with non-default options
+_PAYLOAD_JSON_ENCODER = json.JSONEncoder(separators=(",", ":"))
 
 # --- Logging Setup ---
 logger = logging.getLogger(__name__)  # Initial logger
 
 
+def _mask_to_notes(mask: int) -> List[int]:
+    # Note state is kept as an int with bit n set for MIDI note n; returns the notes ascending.
+    notes = []
+    while mask:
+        lowest_bit = mask & -mask
+        notes.append(lowest_bit.bit_length() - 1)
+        mask ^= lowest_bit
+    return notes
+
+
+def _raise_current_thread_priority() -> None:
+    # Best effort: scheduling jitter dominates MIDI latency, so ask the OS to favour the
+    # calling thread. Unprivileged processes are usually refused, which is fine.
+    try:
+        if sys.platform == "win32":
+            kernel32 = ctypes.windll.kernel32
+            if not kernel32.SetThreadPriority(
+                kernel32.GetCurrentThread(), THREAD_PRIORITY_TIME_CRITICAL
+            ):
+                raise OSError("SetThreadPriority failed")
+        else:
+            # On Linux pid 0 means the calling thread, not the whole process. Only pin
+            # once real-time scheduling is granted, and avoid CPU 0 (usually busy with IRQs).
+            os.sched_setscheduler(
+                0, os.SCHED_FIFO, os.sched_param(MIDI_THREAD_FIFO_PRIORITY)
+            )
+            os.sched_setaffinity(0, {max(os.sched_getaffinity(0))})
+        logger.info("MIDI handler thread priority raised.")
+    except (AttributeError, OSError) as e:
+        logger.debug(f"Could not raise MIDI handler thread priority: {e}")
+    sys.setswitchinterval(GIL_SWITCH_INTERVAL)
+
+
 # --- MIDIChordRecognizer Class ---
 class MIDIChordRecognizer:
     def __init__(
@@ -32,25 +85,57 @@ class MIDIChordRecognizer:
         chord_config_path: str = DEFAULT_CHORD_CONFIG_PATH,
         use_zmq: bool = True,
         update_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+        zmq_transport: str = DEFAULT_ZMQ_TRANSPORT,
     ):
+        if zmq_transport not in ZMQ_TRANSPORTS:
+            raise ValueError(
+                f"Unknown ZMQ transport '{zmq_transport}', expected one of {ZMQ_TRANSPORTS}."
+            )
         self.midi_port_name = midi_port_name
         self.zmq_pub_port = zmq_pub_port
+        # tcp reaches other hosts; ipc (same host) and inproc (same process) skip the TCP stack
+        self.zmq_transport = zmq_transport
+        self.zmq_endpoint = self._zmq_endpoint()
         self.min_notes = min_notes_for_chord
         self.chord_buffer_time = chord_buffer_time_on
         self.chord_config_path = chord_config_path
-        self.active_notes: Set[int] = set()
+        # 128-bit masks of MIDI notes: sounding notes, and notes released under the pedal
+        self.active_mask: int = 0
         self.sustain_pedal_on: bool = False
-        self.sustained_notes_pending_release: Set[int] = set()
-        self.running = False
+        self.sustained_mask: int = 0
+        # Publish coalescing: at most one publish per chord_buffer_time while input is backlogged
+        self._publish_pending: bool = False
+        self._next_publish_allowed: float = 0.0
+        self._next_traceback_allowed: float = 0.0
+        # Set while the recognizer runs; the MIDI thread polls it instead of taking a lock.
+        # Note state is only touched by the MIDI thread, so the handler needs no lock.
+        self._running = threading.Event()
+        # Latest published data; replaced (never mutated) so other threads can read it freely
+        self.latest_chord_data: Optional[Dict[str, Any]] = None
+        self._latest_chord_mask: int = -1  # active_mask that latest_chord_data describes
         self.midi_port: Optional[mido.ports.BaseInput] = None
         self.zmq_context: Optional[zmq.Context] = None
         self.zmq_socket: Optional[zmq.Socket] = None
-        self.lock = threading.Lock()
+        self.lock = threading.Lock()  # Serialises start() / stop()
         self.midi_thread: Optional[threading.Thread] = None
         self.use_zmq = use_zmq
         self.update_callback = update_callback
         ChordTheory.load_chord_definitions(self.chord_config_path)
 
+    @property
+    def running(self) -> bool:
+        return self._running.is_set()
+
+    def _zmq_endpoint(self) -> str:
+        if self.zmq_transport == "inproc":
+            return ZMQ_INPROC_ENDPOINT
+        if self.zmq_transport == "ipc":
+            socket_path = os.path.join(
+                tempfile.gettempdir(), f"chord-events-{self.zmq_pub_port}.sock"
+            )
+            return f"ipc://{socket_path}"
+        return f"tcp://*:{self.zmq_pub_port}"
+
     def _setup_midi(self) -> bool:
         try:
             available_ports = mido.get_input_names()
@@ -92,10 +177,20 @@ class MIDIChordRecognizer:
                     True  # Return True to indicate setup (of "nothing") was successful
                 )
 
-            self.zmq_context = zmq.Context()
+            # inproc peers must share a context, so use the process-wide one there
+            if self.zmq_transport == "inproc":
+                self.zmq_context = zmq.Context.instance()
+            else:
+                self.zmq_context = zmq.Context()
             self.zmq_socket = self.zmq_context.socket(zmq.PUB)
-            self.zmq_socket.bind(f"tcp://*:{self.zmq_pub_port}")
-            logger.info(f"ZMQ publisher bound to tcp://*:{self.zmq_pub_port}")
+            # Subscribers only care about the current chord: keep just the latest
+            # unsent update, queue only to connected peers, and drop leftovers on close.
+            self.zmq_socket.setsockopt(zmq.CONFLATE, 1)
+            self.zmq_socket.setsockopt(zmq.IMMEDIATE, 1)
+            self.zmq_socket.setsockopt(zmq.LINGER, 0)
+            self.zmq_socket.setsockopt(zmq.SNDHWM, ZMQ_SEND_HWM)
+            self.zmq_socket.bind(self.zmq_endpoint)
+            logger.info(f"ZMQ publisher bound to {self.zmq_endpoint}")
             return True
         except zmq.ZMQError as e:
             logger.error(f"ZMQ Error during setup: {e}")
@@ -105,132 +200,193 @@ class MIDIChordRecognizer:
             return False
 
     def _process_midi_message(self, msg: mido.Message) -> bool:
-        changed = False
+        old_active_mask = self.active_mask
+        # Building note lists for debug output is only worth it when debug is enabled
+        debug = logger.isEnabledFor(logging.DEBUG)
         if msg.type == "note_on" and msg.velocity > 0:
-            if msg.note not in self.active_notes:
-                self.active_notes.add(msg.note)
-                changed = True
-            if msg.note in self.sustained_notes_pending_release:
-                self.sustained_notes_pending_release.discard(msg.note)
-            logger.debug(
-                f"Note ON: {msg.note} Vel: {msg.velocity} | Active: {sorted(list(self.active_notes))}"
-            )
+            note_bit = 1 << msg.note
+            # Re-triggers of a held (not pedal-pending) note change nothing
+            if self.active_mask & ~self.sustained_mask & note_bit:
+                return False
+            self.active_mask |= note_bit
+            self.sustained_mask &= ~note_bit
+            if debug:
+                logger.debug(
+                    "Note ON: %s Vel: %s | Active: %s",
+                    msg.note,
+                    msg.velocity,
+                    _mask_to_notes(self.active_mask),
+                )
         elif msg.type == "note_off" or (msg.type == "note_on" and msg.velocity == 0):
-            if self.sustain_pedal_on:
-                if (
-                    msg.note in self.active_notes
-                    and msg.note not in self.sustained_notes_pending_release
-                ):
-                    self.sustained_notes_pending_release.add(msg.note)
-                    logger.debug(
-                        f"Note OFF (sustained): {msg.note} | Pending: {sorted(list(self.sustained_notes_pending_release))}"
-                    )
-            else:
-                if msg.note in self.active_notes:
-                    self.active_notes.discard(msg.note)
-                    changed = True
-                if msg.note in self.sustained_notes_pending_release:
-                    self.sustained_notes_pending_release.discard(
-                        msg.note
-                    )  # Should be empty if sustain just went off
+            note_bit = 1 << msg.note
+            if not self.active_mask & note_bit:
+                return False
+            # Held by the pedal only if it is sounding and the pedal is down; otherwise released
+            sustain_bit = -int(self.sustain_pedal_on) & note_bit & self.active_mask
+            self.sustained_mask = (self.sustained_mask & ~note_bit) | sustain_bit
+            self.active_mask &= ~note_bit | sustain_bit
+            if debug:
                 logger.debug(
-                    f"Note OFF: {msg.note} | Active: {sorted(list(self.active_notes))}"
+                    "Note OFF%s: %s | Active: %s | Pending: %s",
+                    " (sustained)" if sustain_bit else "",
+                    msg.note,
+                    _mask_to_notes(self.active_mask),
+                    _mask_to_notes(self.sustained_mask),
                 )
         elif msg.type == "control_change" and msg.control == 64:  # Sustain Pedal
             pedal_just_turned_off = False
             if msg.value >= 64:  # Sustain ON
                 if not self.sustain_pedal_on:
                     self.sustain_pedal_on = True
-                    logger.debug(
-                        f"Sustain Pedal ON | Active: {sorted(list(self.active_notes))}"
-                    )
+                    if debug:
+                        logger.debug(
+                            "Sustain Pedal ON | Active: %s",
+                            _mask_to_notes(self.active_mask),
+                        )
             else:  # Sustain OFF
                 if self.sustain_pedal_on:
                     self.sustain_pedal_on = False
                     pedal_just_turned_off = True
                     logger.debug("Sustain Pedal OFF")
             if pedal_just_turned_off:
-                notes_to_remove = self.sustained_notes_pending_release.copy()
-                if notes_to_remove:
-                    for note_rm in notes_to_remove:
-                        self.active_notes.discard(note_rm)
-                    changed = True
+                released = self.sustained_mask
+                self.active_mask &= ~released
+                self.sustained_mask = 0
+                if debug and released:
                     logger.debug(
-                        f"Post Sustain OFF, removed: {sorted(list(notes_to_remove))} | Active: {sorted(list(self.active_notes))}"
+                        "Post Sustain OFF, removed: %s | Active: %s",
+                        _mask_to_notes(released),
+                        _mask_to_notes(self.active_mask),
                     )
-                self.sustained_notes_pending_release.clear()
+        return self.active_mask != old_active_mask
+
+    def _drain_pending_messages(self) -> bool:
+        changed = False
+        msg = self.midi_port.poll()
+        while msg is not None:
+            changed |= self._process_midi_message(msg)
+            msg = self.midi_port.poll()
         return changed
 
     def _midi_handler(self):
         logger.info("MIDI handler thread started.")
-        while self.running:
+        _raise_current_thread_priority()
+        while self._running.is_set():
             try:
                 if not self.midi_port:
                     logger.error("MIDI port is not open in handler loop.")
                     time.sleep(1)
                     continue
+                if self._publish_pending:
+                    # Trailing edge of the coalescing window: wait out the remaining buffer
+                    # time, then publish the latest state.
+                    time.sleep(max(0.0, self._next_publish_allowed - time.monotonic()))
+                    self._drain_pending_messages()
+                    self._update_chord_and_publish()
+                    continue
                 msg = self.midi_port.receive(block=True)
-                if not self.running:
+                if not self._running.is_set():
                     break
-                with self.lock:
-                    if self._process_midi_message(msg):
-                        self._update_chord_and_publish()
+                # Fold in everything queued behind this message so a struck chord is
+                # recognised once rather than once per note.
+                changed = self._process_midi_message(msg)
+                changed |= self._drain_pending_messages()
+                if changed:
+                    self._publish_pending = True
+                if (
+                    self._publish_pending
+                    and time.monotonic() >= self._next_publish_allowed
+                ):
+                    self._update_chord_and_publish()
             except Exception as e:
-                if self.running:
-                    logger.error(f"Error in MIDI handler thread: {e}", exc_info=True)
+                if self._running.is_set():
+                    self._log_midi_thread_error(f"Error in MIDI handler thread: {e}")
                     time.sleep(0.1)
         logger.info("MIDI handler thread stopped.")
 
+    def _log_midi_thread_error(self, message: str):
+        # Formatting a traceback per failing message can starve the MIDI thread when the
+        # input keeps failing, so include one at most every ERROR_TRACEBACK_INTERVAL.
+        now = time.monotonic()
+        log_traceback = now >= self._next_traceback_allowed
+        if log_traceback:
+            self._next_traceback_allowed = now + ERROR_TRACEBACK_INTERVAL
+        logger.error(message, exc_info=log_traceback)
+
     def _update_chord_and_publish(self):
-        chord_info = ChordTheory.recognize_chord(self.active_notes, self.min_notes)
-        publish_data: Dict[str, Any] = {
-            "timestamp": time.time(),
-            "full_chord_name": "N.C.",
-            "played_notes_midi": sorted(list(self.active_notes)),
-            "root_note_name": None,
-            "bass_note_name": None,
-            "inversion_type": None,
-            "score": 0.0,
-        }
+        self._publish_pending = False
+        self._next_publish_allowed = time.monotonic() + self.chord_buffer_time
         if (
-            self.active_notes
-        ):  # Set bass_note_name if notes are played, even if no chord
-            publish_data["bass_note_name"] = ChordTheory.midi_to_pitch_class_name(
-                sorted(list(self.active_notes))[0]
-            )
-
-        if chord_info:
-            publish_data.update(chord_info)
-            logger.info(
-                f"Chord: {publish_data['full_chord_name']} "
-                f"({publish_data.get('inversion_type', 'N/A')}), "
-                f"Score: {publish_data.get('score', 0.0):.2f}, "
-                f"Notes: {publish_data['played_notes_midi']}"
-            )
+            self.latest_chord_data is not None
+            and self.active_mask == self._latest_chord_mask
+        ):
+            # Same notes as the last publish (e.g. a note pressed and released within one
+            # coalescing window): reuse that payload and only refresh its timestamp.
+            publish_data = self.latest_chord_data.copy()
+            publish_data["timestamp"] = time.time()
         else:
-            logger.info(f"N.C. Active notes: {publish_data['played_notes_midi']}")
+            publish_data = self._build_publish_data()
+            self._latest_chord_mask = self.active_mask
+        self.latest_chord_data = publish_data
 
         # Call the callback if it exist
         if self.update_callback:
             try:
                 self.update_callback(publish_data)
             except Exception as e:
-                logger.error(f"Error in update_callback: {e}", exc_info=True)
+                self._log_midi_thread_error(f"Error in update_callback: {e}")
 
         if self.use_zmq:  # Only publish to ZMQ if enabled
             self._publish(publish_data)  # _publish now only handles ZMQ
 
-        if self.chord_buffer_time > 0:
-            time.sleep(self.chord_buffer_time)
+    def _build_publish_data(self) -> Dict[str, Any]:
+        played_notes = _mask_to_notes(self.active_mask)
+        chord_info = ChordTheory.recognize_chord(
+            played_notes, self.min_notes, midi_mask_to_pc_mask(self.active_mask)
+        )
+        if chord_info:
+            # recognize_chord() returns a fresh dict holding every payload field, so it is
+            # published as is rather than copied into an N.C. template.
+            publish_data = chord_info
+            publish_data["timestamp"] = time.time()
+            logger.info(
+                "Chord: %s (%s), Score: %.2f, Notes: %s",
+                publish_data["full_chord_name"],
+                publish_data.get("inversion_type", "N/A"),
+                publish_data.get("score", 0.0),
+                publish_data["played_notes_midi"],
+            )
+        else:
+            publish_data = {
+                "timestamp": time.time(),
+                "full_chord_name": "N.C.",
+                "played_notes_midi": played_notes,
+                "root_note_name": None,
+                "bass_note_name": None,
+                "inversion_type": None,
+                "score": 0.0,
+            }
+            if played_notes:  # Set bass_note_name if notes are played, even if no chord
+                publish_data["bass_note_name"] = ChordTheory.midi_to_pitch_class_name(
+                    played_notes[0]
+                )
+            logger.info("N.C. Active notes: %s", publish_data["played_notes_midi"])
+        return publish_data
 
     def _publish(self, data_to_publish: Dict):
         if not self.zmq_socket or not self.running:
             return
         try:
-            self.zmq_socket.send_json(data_to_publish)
+            # NOBLOCK so a slow subscriber can never stall the MIDI thread
+            self.zmq_socket.send(
+                _PAYLOAD_JSON_ENCODER.encode(data_to_publish).encode("utf8"),
+                flags=zmq.NOBLOCK,
+            )
             logger.debug(
-                f"ZMQ Published: {data_to_publish.get('full_chord_name', 'N.C.')}"
+                "ZMQ Published: %s", data_to_publish.get("full_chord_name", "N.C.")
             )
+        except zmq.Again:
+            logger.debug("ZMQ send queue full, chord update dropped.")
         except zmq.ZMQError as e:
             logger.warning(f"ZMQ publish error: {e}")
         except Exception as e:
@@ -246,7 +402,7 @@ class MIDIChordRecognizer:
                 logger.error("Setup failed. Cleaning up and aborting start.")
                 self._cleanup()
                 return False
-            self.running = True
+            self._running.set()
             self.midi_thread = threading.Thread(
                 target=self._midi_handler, name="MIDIHandlerThread", daemon=True
             )
@@ -260,7 +416,50 @@ class MIDIChordRecognizer:
             if not self.running:
                 logger.info("Recognizer already stopped.")
                 return
-            self.running = False
+            self._running.clear()
+        self._join_midi_thread()
+        with self.lock:
+            self._cleanup()
+        logger.info("Recognizer stopped.")
+
+    def switch_midi_port(
+        self, port_name: str, on_input_stopped: Optional[Callable[[], Any]] = None
+    ) -> bool:
+        """Reopens only the MIDI input on another port; the ZMQ publisher stays bound.
+
+        on_input_stopped runs once the old port's thread has been joined and before the
+        new one starts, e.g. to discard updates still pending from the old port.
+        """
+        with self.lock:
+            if not self.running:
+                switch_needs_start = True
+            else:
+                switch_needs_start = False
+                logger.info(f"Switching MIDI input to '{port_name}'...")
+                self._running.clear()
+        if switch_needs_start:
+            self.midi_port_name = port_name
+            return self.start()
+        self._join_midi_thread()
+        if on_input_stopped:
+            on_input_stopped()
+        with self.lock:
+            self._close_midi()
+            self.midi_port_name = port_name
+            if not self._setup_midi():
+                logger.error("Switching MIDI input failed. Stopping recognizer.")
+                self._cleanup()
+                return False
+            self._running.set()
+            self.midi_thread = threading.Thread(
+                target=self._midi_handler, name="MIDIHandlerThread", daemon=True
+            )
+            self.midi_thread.start()
+            logger.info(f"MIDI input switched to '{self.midi_port.name}'.")
+            return True
+
+    def _join_midi_thread(self):
+        # Called after _running is cleared; closing the port unblocks receive()
         if self.midi_thread and self.midi_thread.is_alive():
             logger.debug("Waiting for MIDI handler thread to join...")
             if self.midi_port:
@@ -272,12 +471,8 @@ class MIDIChordRecognizer:
             self.midi_thread.join(timeout=2.0)
             if self.midi_thread.is_alive():
                 logger.warning("MIDI handler thread did not join in time.")
-        with self.lock:
-            self._cleanup()
-        logger.info("Recognizer stopped.")
 
-    def _cleanup(self):
-        logger.debug("Cleaning up resources...")
+    def _close_midi(self):
         if self.midi_port and not self.midi_port.closed:
             try:
                 self.midi_port.close()
@@ -285,6 +480,16 @@ class MIDIChordRecognizer:
             except Exception as e:
                 logger.warning(f"Error closing MIDI port: {e}")
         self.midi_port = None
+        # Notes held on the old port will never see their note-off
+        self.active_mask = 0
+        self.sustained_mask = 0
+        self.sustain_pedal_on = False
+        self._publish_pending = False
+        self._latest_chord_mask = -1
+
+    def _cleanup(self):
+        logger.debug("Cleaning up resources...")
+        self._close_midi()
         if self.zmq_socket:
             try:
                 self.zmq_socket.close(linger=0)
@@ -292,16 +497,14 @@ class MIDIChordRecognizer:
             except Exception as e:
                 logger.warning(f"Error closing ZMQ socket: {e}")
         self.zmq_socket = None
-        if self.zmq_context:
+        if self.zmq_context and self.zmq_transport != "inproc":
+            # The shared inproc context belongs to the process; leave it for other users
             try:
                 self.zmq_context.term()
                 logger.debug("ZMQ context terminated.")
             except Exception as e:
                 logger.warning(f"Error terminating ZMQ context: {e}")
         self.zmq_context = None
-        self.active_notes.clear()
-        self.sustained_notes_pending_release.clear()
-        self.sustain_pedal_on = False
         logger.debug("Internal state cleared.")
 
 
@@ -319,6 +522,13 @@ if __name__ == "__main__":
         default=DEFAULT_ZMQ_PUB_PORT,
         help=f"ZMQ port (default: {DEFAULT_ZMQ_PUB_PORT}).",
     )
+    parser.add_argument(
+        "--zmq-transport",
+        type=str,
+        default=DEFAULT_ZMQ_TRANSPORT,
+        choices=CLI_ZMQ_TRANSPORTS,
+        help=f"ZMQ transport (default: {DEFAULT_ZMQ_TRANSPORT}).",
+    )
     parser.add_argument(
         "--min-notes",
         type=int,
@@ -350,10 +560,22 @@ if __name__ == "__main__":
     args = parser.parse_args()
 
     log_level_numeric = getattr(logging, args.log_level.upper(), logging.INFO)
+    # Records are queued by the emitting thread and written by a listener thread,
+    # so console I/O never blocks the MIDI handler.
+    log_handler = logging.StreamHandler()
+    log_handler.setFormatter(
+        logging.Formatter(
+            "%(asctime)s - %(levelname)s - [%(threadName)s] %(name)s.%(funcName)s:%(lineno)d - %(message)s"
+        )
+    )
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue()
+    log_listener = logging.handlers.QueueListener(log_queue, log_handler)
     logging.basicConfig(
         level=log_level_numeric,
-        format="%(asctime)s - %(levelname)s - [%(threadName)s] %(name)s.%(funcName)s:%(lineno)d - %(message)s",
+        handlers=[logging.handlers.QueueHandler(log_queue)],
     )
+    log_listener.start()
+    atexit.register(log_listener.stop)
 
     if args.list_midi_ports:
         try:
@@ -373,6 +595,7 @@ if __name__ == "__main__":
         min_notes_for_chord=args.min_notes,
         chord_buffer_time_on=args.buffer_time,
         chord_config_path=args.config,
+        zmq_transport=args.zmq_transport,
     )
 
     if recognizer.start():
@@ -1,10 +1,10 @@
 # --- ChordTheory Class ---
-from collections import OrderedDict
+import functools
 import json
 import logging
 import os
 from pathlib import Path
-from typing import Any, Dict, FrozenSet, Optional, Set, Tuple
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
 
 from utils.utils import resource_path
 
@@ -27,8 +27,65 @@ MIN_ACCEPTABLE_CHORD_SCORE = 0.6  # Threshold for chord recognition
 logger = logging.getLogger(__name__)  # Initial logger, will be configured in main
 
 
+# --- Pitch-Class Bitmask Helpers ---
+# A pitch-class set is encoded as a 12-bit int: bit n is set when pitch class n is present.
+PC_MASK_ALL = 0xFFF
+# Number of set bits for every possible 12-bit mask (table lookup is cheaper than counting).
+_POPCOUNT_12: Tuple[int, ...] = tuple(bin(m).count("1") for m in range(1 << 12))
+# Pitch-class bit for every MIDI note number.
+_MIDI_NOTE_PC_BITS: Tuple[int, ...] = tuple(1 << (note % 12) for note in range(128))
+# Ascending pitch classes of every possible 12-bit mask, so results don't re-walk the bits.
+_PC_TUPLES_12: Tuple[Tuple[int, ...], ...] = tuple(
+    tuple(pc for pc in range(12) if (m >> pc) & 1) for m in range(1 << 12)
+)
+
+
+def intervals_to_pc_mask(intervals: Iterable[int]) -> int:
+    mask = 0
+    for interval in intervals:
+        mask |= 1 << (interval % 12)
+    return mask
+
+
+def rotate_pc_mask(mask: int, steps: int) -> int:
+    """Transposes a pitch-class mask up by `steps` semitones (mod 12)."""
+    steps %= 12
+    return ((mask << steps) | (mask >> (12 - steps))) & PC_MASK_ALL
+
+
+def midi_mask_to_pc_mask(note_mask: int) -> int:
+    """Folds a MIDI note bitmask (bit n = note n, 0-127) onto a 12-bit pitch-class mask."""
+    return (
+        note_mask
+        | note_mask >> 12
+        | note_mask >> 24
+        | note_mask >> 36
+        | note_mask >> 48
+        | note_mask >> 60
+        | note_mask >> 72
+        | note_mask >> 84
+        | note_mask >> 96
+        | note_mask >> 108
+        | note_mask >> 120
+    ) & PC_MASK_ALL
+
+
+def pc_mask_to_list(mask: int) -> List[int]:
+    return list(_PC_TUPLES_12[mask & PC_MASK_ALL])
+
+
+# Voicing description for each played span in semitones (under 1, 1.5 and 2.5 octaves);
+# wider spans use the last entry.
+_VOICING_DENSITY_BY_SPAN: Tuple[str, ...] = (
+    ("Very Close Voicing",) * 12
+    + ("Close Voicing",) * 6
+    + ("Moderately Open Voicing",) * 12
+    + ("Very Open (Spread) Voicing",)
+)
+
+
 class ChordTheory:
-    NOTE_PITCH_CLASSES = [
+    NOTE_PITCH_CLASSES: Tuple[str, ...] = (
         "C",
         "C#",
         "D",
@@ -41,61 +98,72 @@ class ChordTheory:
         "A",
         "A#",
         "B",
-    ]
+    )
 
     # CHORD_DEFINITIONS based on the formula image and discussion
-    CHORD_DEFINITIONS: Dict[str, Tuple[str, FrozenSet[int]]] = OrderedDict(
-        [
+    CHORD_DEFINITIONS: Dict[str, Tuple[str, FrozenSet[int]]] = {
         # --- MAJOR ---
-        ('maj', ("Major Triad", frozenset([0, 4, 7]))),
-        ('add4', ("Major Add 4", frozenset([0, 4, 5, 7]))),
-        ('6', ("Major Sixth", frozenset([0, 4, 7, 9]))),
-        ('6/9', ("Major Six Nine", frozenset([0, 2, 4, 7, 9]))),
-        ('maj7', ("Major 7th", frozenset([0, 4, 7, 11]))),
-        ('maj9', ("Major 9th", frozenset([0, 2, 4, 7, 11]))),
-        ('maj11_formula', ("Major 11th (Formula)", frozenset([0, 2, 4, 5, 7, 11]))),
-        ('maj13_formula', ("Major 13th (Formula)", frozenset([0, 2, 4, 5, 7, 9, 11]))),
-        ('maj7#11', ("Major 7th Sharp 11th", frozenset([0, 4, 6, 7, 11]))),
-        ('majb5', ("Major Flat 5", frozenset([0, 4, 6]))),
+        'maj': ("Major Triad", frozenset([0, 4, 7])),
+        'add4': ("Major Add 4", frozenset([0, 4, 5, 7])),
+        '6': ("Major Sixth", frozenset([0, 4, 7, 9])),
+        '6/9': ("Major Six Nine", frozenset([0, 2, 4, 7, 9])),
+        'maj7': ("Major 7th", frozenset([0, 4, 7, 11])),
+        'maj9': ("Major 9th", frozenset([0, 2, 4, 7, 11])),
+        'maj11_formula': ("Major 11th (Formula)", frozenset([0, 2, 4, 5, 7, 11])),
+        'maj13_formula': ("Major 13th (Formula)", frozenset([0, 2, 4, 5, 7, 9, 11])),
+        'maj7#11': ("Major 7th Sharp 11th", frozenset([0, 4, 6, 7, 11])),
+        'majb5': ("Major Flat 5", frozenset([0, 4, 6])),
 
         # --- MINOR ---
-        ('min', ("Minor Triad", frozenset([0, 3, 7]))),
-        ('madd4', ("Minor Add 4", frozenset([0, 3, 5, 7]))),
-        ('min6', ("Minor Sixth", frozenset([0, 3, 7, 9]))),
-        ('min7', ("Minor 7th", frozenset([0, 3, 7, 10]))),
-        ('madd9', ("Minor Add 9", frozenset([0, 2, 3, 7]))),
-        ('m6/9', ("Minor Six Nine", frozenset([0, 2, 3, 7, 9]))),
-        ('min9', ("Minor 9th", frozenset([0, 2, 3, 7, 10]))),
-        ('min11_formula', ("Minor 11th (Formula)", frozenset([0, 2, 3, 5, 7, 10]))),
-        ('min13_formula', ("Minor 13th (Formula)", frozenset([0, 2, 3, 5, 7, 9, 10]))),
-        ('minMaj7', ("Minor Major 7th", frozenset([0, 3, 7, 11]))),
-        ('minMaj9', ("Minor Major 9th", frozenset([0, 2, 3, 7, 11]))),
-        ('minMaj11_formula', ("Minor Major 11th (Formula)", frozenset([0, 2, 3, 5, 7, 11]))),
-        ('minMaj13_formula', ("Minor Major 13th (Formula)", frozenset([0, 2, 3, 5, 7, 9, 11]))),
-        ('min7b5', ("Half-Diminished 7th", frozenset([0, 3, 6, 10]))), # ø or m7-5
+        'min': ("Minor Triad", frozenset([0, 3, 7])),
+        'madd4': ("Minor Add 4", frozenset([0, 3, 5, 7])),
+        'min6': ("Minor Sixth", frozenset([0, 3, 7, 9])),
+        'min7': ("Minor 7th", frozenset([0, 3, 7, 10])),
+        'madd9': ("Minor Add 9", frozenset([0, 2, 3, 7])),
+        'm6/9': ("Minor Six Nine", frozenset([0, 2, 3, 7, 9])),
+        'min9': ("Minor 9th", frozenset([0, 2, 3, 7, 10])),
+        'min11_formula': ("Minor 11th (Formula)", frozenset([0, 2, 3, 5, 7, 10])),
+        'min13_formula': ("Minor 13th (Formula)", frozenset([0, 2, 3, 5, 7, 9, 10])),
+        'minMaj7': ("Minor Major 7th", frozenset([0, 3, 7, 11])),
+        'minMaj9': ("Minor Major 9th", frozenset([0, 2, 3, 7, 11])),
+        'minMaj11_formula': ("Minor Major 11th (Formula)", frozenset([0, 2, 3, 5, 7, 11])),
+        'minMaj13_formula': ("Minor Major 13th (Formula)", frozenset([0, 2, 3, 5, 7, 9, 11])),
+        'min7b5': ("Half-Diminished 7th", frozenset([0, 3, 6, 10])), # ø or m7-5
 
         # --- DOMINANT ---
-        ('7', ("Dominant 7th", frozenset([0, 4, 7, 10]))),
-        ('9', ("Dominant 9th", frozenset([0, 2, 4, 7, 10]))),
-        ('11', ("Dominant 11th (no 3rd)", frozenset([0, 2, 5, 7, 10]))), # Common practical
-        ('dom11_formula', ("Dominant 11th (Formula, with 3rd)", frozenset([0, 2, 4, 5, 7, 10]))),
-        ('13', ("Dominant 13th (no 11th)", frozenset([0, 2, 4, 7, 9, 10]))), # Common practical
-        ('dom13_formula', ("Dominant 13th (Formula, with P11)", frozenset([0, 2, 4, 5, 7, 9, 10]))),
-        ('7#5', ("Dominant 7th Sharp 5", frozenset([0, 4, 8, 10]))), # aug7
+        '7': ("Dominant 7th", frozenset([0, 4, 7, 10])),
+        '9': ("Dominant 9th", frozenset([0, 2, 4, 7, 10])),
+        '11': ("Dominant 11th (no 3rd)", frozenset([0, 2, 5, 7, 10])), # Common practical
+        'dom11_formula': ("Dominant 11th (Formula, with 3rd)", frozenset([0, 2, 4, 5, 7, 10])),
+        '13': ("Dominant 13th (no 11th)", frozenset([0, 2, 4, 7, 9, 10])), # Common practical
+        'dom13_formula': ("Dominant 13th (Formula, with P11)", frozenset([0, 2, 4, 5, 7, 9, 10])),
+        '7#5': ("Dominant 7th Sharp 5", frozenset([0, 4, 8, 10])), # aug7
 
         # --- OTHER Common Chords ---
-        ('sus4', ("Suspended 4th", frozenset([0, 5, 7]))),
-        ('sus2', ("Suspended 2nd", frozenset([0, 2, 7]))),
-        ('7sus4', ("Dominant 7th Suspended 4th", frozenset([0, 5, 7, 10]))),
-        ('dim', ("Diminished Triad", frozenset([0, 3, 6]))),
-        ('aug', ("Augmented Triad", frozenset([0, 4, 8]))),
-        ('dim7', ("Diminished 7th", frozenset([0, 3, 6, 9]))),
-        ('7b5', ("Dominant 7th Flat 5", frozenset([0, 4, 6, 10]))),
-        ('7b9', ("Dominant 7th Flat 9", frozenset([0, 1, 4, 7, 10]))),
-        ('7#9', ("Dominant 7th Sharp 9", frozenset([0, 3, 4, 7, 10]))), # #9 is same PC as m3
-        ('5', ("Power Chord", frozenset([0, 7]))),
-        ]
-    )
+        'sus4': ("Suspended 4th", frozenset([0, 5, 7])),
+        'sus2': ("Suspended 2nd", frozenset([0, 2, 7])),
+        '7sus4': ("Dominant 7th Suspended 4th", frozenset([0, 5, 7, 10])),
+        'dim': ("Diminished Triad", frozenset([0, 3, 6])),
+        'aug': ("Augmented Triad", frozenset([0, 4, 8])),
+        'dim7': ("Diminished 7th", frozenset([0, 3, 6, 9])),
+        '7b5': ("Dominant 7th Flat 5", frozenset([0, 4, 6, 10])),
+        '7b9': ("Dominant 7th Flat 9", frozenset([0, 1, 4, 7, 10])),
+        '7#9': ("Dominant 7th Sharp 9", frozenset([0, 3, 4, 7, 10])), # #9 is same PC as m3
+        '5': ("Power Chord", frozenset([0, 7])),
+    }
+
+    # Flat scan table built from CHORD_DEFINITIONS by _compile_chord_masks(), one row per
+    # (root, chord) pair in root-major order:
+    # (root_pc, chord_type, desc, rooted_mask, defined_mask, defined_count)
+    _chord_mask_table: Tuple[Tuple[int, str, str, int, int, int], ...] = ()
+    # Rows of _chord_mask_table indexed by played note count, keeping only chords whose
+    # size still allows MIN_ACCEPTABLE_CHORD_SCORE (Jaccard <= min(p, d) / max(p, d))
+    _chord_rows_by_played_count: Tuple[Tuple[Tuple[int, str, str, int, int, int], ...], ...] = ()
+    # (resolved path, mtime_ns, size) of the definitions file currently loaded, so
+    # reloading an unchanged file keeps the compiled tables and recognition cache.
+    _loaded_definitions_key: Optional[Tuple[str, int, int]] = None
+    # rooted_mask -> _recognize_by_mask() result for the first exact match in scan order
+    _exact_chord_matches: Dict[int, Tuple[float, int, str, str, int]] = {}
 
     INTERVAL_NAMES = {
         0: "R",
@@ -138,16 +206,28 @@ class ChordTheory:
                 )
                 return
 
+            file_stat = config_file.stat()
+            definitions_key = (
+                str(config_file.resolve()),
+                file_stat.st_mtime_ns,
+                file_stat.st_size,
+            )
+            if definitions_key == cls._loaded_definitions_key:
+                logger.debug(
+                    f"Chord definitions from '{config_path}' are unchanged; keeping loaded set."
+                )
+                return
+
             with open(config_file, "r") as f:
                 custom_chords = json.load(f)
 
-            loaded_definitions = OrderedDict()
+            loaded_definitions = {}
             for chord_type, data in custom_chords.items():
                 intervals = data.get("intervals")
                 name = data.get("name")
                 if (
                     isinstance(intervals, list)
-                    and all(isinstance(i, int) for i in intervals)
+                    and all(isinstance(i, int) and 0 <= i <= 11 for i in intervals)
                     and isinstance(name, str)
                 ):
                     loaded_definitions[chord_type] = (name, frozenset(intervals))
@@ -155,12 +235,17 @@ class ChordTheory:
                         f"Loaded custom chord: {chord_type} - {name} {intervals}"
                     )
                 else:
+                    # Chords are matched as pitch-class sets, so intervals must lie within
+                    # one octave (0-11); write a 9th as 2, a 13th as 9, and so on.
                     logger.warning(
-                        f"Skipping invalid chord definition for '{chord_type}' in '{config_path}'."
+                        f"Skipping invalid chord definition for '{chord_type}' in '{config_path}' "
+                        f"(needs a name and integer intervals from 0 to 11)."
                     )
 
             if loaded_definitions:
                 cls.CHORD_DEFINITIONS = loaded_definitions
+                cls._compile_chord_masks()
+                cls._loaded_definitions_key = definitions_key
                 logger.info(
                     f"Successfully loaded {len(loaded_definitions)} chord definitions from '{config_path}'."
                 )
@@ -178,6 +263,44 @@ class ChordTheory:
                 f"Failed to load chord definitions from '{config_path}': {e}. Using default definitions."
             )
 
+    @classmethod
+    def _compile_chord_masks(cls) -> None:
+        chord_masks = [
+            (chord_type, desc_name, intervals_to_pc_mask(intervals))
+            for chord_type, (desc_name, intervals) in cls.CHORD_DEFINITIONS.items()
+        ]
+        cls._chord_mask_table = tuple(
+            (
+                root_pc,
+                chord_type,
+                desc_name,
+                rotate_pc_mask(mask, root_pc),
+                mask,
+                _POPCOUNT_12[mask],
+            )
+            for root_pc in range(12)
+            for chord_type, desc_name, mask in chord_masks
+        )
+        cls._chord_rows_by_played_count = tuple(
+            tuple(
+                row
+                for row in cls._chord_mask_table
+                if played_count
+                and min(played_count, row[5]) / max(played_count, row[5])
+                >= MIN_ACCEPTABLE_CHORD_SCORE
+            )
+            for played_count in range(13)
+        )
+        # An exact match scores 1.0, the maximum, and all exact matches tie on strength,
+        # so the scan would keep the first one it meets; setdefault does the same.
+        exact_matches: Dict[int, Tuple[float, int, str, str, int]] = {}
+        for root_pc, chord_type, desc_name, rooted_mask, mask, _ in cls._chord_mask_table:
+            exact_matches.setdefault(
+                rooted_mask, (1.0, root_pc, chord_type, desc_name, mask)
+            )
+        cls._exact_chord_matches = exact_matches
+        cls._recognize_by_mask.cache_clear()
+
     @staticmethod
     def midi_to_pitch_class_name(midi_note: int) -> str:
         if not (0 <= midi_note <= 127):
@@ -189,94 +312,118 @@ class ChordTheory:
         names_map = cls.EXT_INTERVAL_NAMES if use_extended_names else cls.INTERVAL_NAMES
         return names_map.get(interval % 12, str(interval))
 
+    # Recognition depends only on the 12-bit pitch-class mask, so the full scan is
+    # memoised per mask; _compile_chord_masks() clears the cache.
+    @classmethod
+    @functools.lru_cache(maxsize=4096)
+    def _recognize_by_mask(
+        cls, played_mask: int
+    ) -> Optional[Tuple[float, int, str, str, int]]:
+        """Returns (score, root_pc, chord_type, chord_desc, defined_mask) or None."""
+        exact_match = cls._exact_chord_matches.get(played_mask)
+        if exact_match is not None:
+            return exact_match
+
+        # Jaccard similarity between the played set and every chord at every root,
+        # computed on bitmasks against the pre-transposed table. Chords too small or
+        # too large to reach the threshold are pruned up front; they could only win
+        # when nothing is accepted anyway.
+        popcount = _POPCOUNT_12
+        played_count = popcount[played_mask]
+        best_score = -1.0
+        best_root_pc = -1
+        best_chord_type: Optional[str] = None
+        best_chord_desc: Optional[str] = None
+        best_defined_mask = 0
+        best_match_strength = 0.0  # Tie-break: matched tones + 0.1 per defined tone
+
+        for (
+            root_pc_candidate,
+            chord_type_def,
+            desc_name_def,
+            rooted_mask,
+            defined_mask,
+            defined_count,
+        ) in cls._chord_rows_by_played_count[played_count]:
+            intersection_mask = played_mask & rooted_mask
+            if not intersection_mask:
+                continue  # Scores 0, which can never be accepted
+            intersection_count = popcount[intersection_mask]
+            score = intersection_count / (played_count + defined_count - intersection_count)
+
+            if score < best_score:
+                continue
+            # Higher score wins; equal scores fall back to the tie-break strength
+            match_strength = intersection_count + defined_count * 0.1
+            if score > best_score or match_strength > best_match_strength:
+                best_score = score
+                best_match_strength = match_strength
+                best_root_pc = root_pc_candidate
+                best_chord_type = chord_type_def
+                best_chord_desc = desc_name_def
+                best_defined_mask = defined_mask
+
+        if best_score < MIN_ACCEPTABLE_CHORD_SCORE:
+            return None
+        return (
+            best_score,
+            best_root_pc,
+            best_chord_type,
+            best_chord_desc,
+            best_defined_mask,
+        )
+
     @classmethod
     def recognize_chord(
-        cls, played_midi_notes: Set[int], min_notes_for_chord: int
+        cls,
+        sorted_played_midi_notes: Sequence[int],
+        min_notes_for_chord: int,
+        played_pc_mask: Optional[int] = None,
     ) -> Optional[Dict[str, Any]]:
-        if len(played_midi_notes) < min_notes_for_chord:
+        # Callers pass the notes already sorted ascending (the engine derives them in
+        # order from its note bitmask), so no re-sort is needed here. Callers that track
+        # a note bitmask can also pass its pitch-class fold as played_pc_mask.
+        if len(sorted_played_midi_notes) < min_notes_for_chord:
             return None
 
-        sorted_played_midi_notes = sorted(list(played_midi_notes))
         lowest_midi_note = sorted_played_midi_notes[0]
 
-        played_pitch_classes = frozenset(note % 12 for note in sorted_played_midi_notes)
+        if played_pc_mask is None:
+            played_mask = 0
+            for note in sorted_played_midi_notes:
+                played_mask |= _MIDI_NOTE_PC_BITS[note]
+        else:
+            played_mask = played_pc_mask
 
-        best_match_info = {
-            "score": -1.0,
-            "root_pc": -1,
-            "chord_type": None,
-            "chord_desc": None,
-            "defined_intervals": frozenset(),
-            "matched_defined_intervals": frozenset(),
-            "extra_played_pcs_rel_to_root": frozenset(),
-        }
-
-        for root_pc_candidate in range(12):
-            relative_played_pcs = frozenset(
-                (pc - root_pc_candidate + 12) % 12 for pc in played_pitch_classes
-            )
-            for chord_type_def, (
-                desc_name_def,
-                defined_intervals_def,
-            ) in cls.CHORD_DEFINITIONS.items():
-                intersection = relative_played_pcs & defined_intervals_def
-                union = relative_played_pcs | defined_intervals_def
-                score = len(intersection) / len(union) if union else 0.0
-
-                if score > best_match_info["score"]:
-                    best_match_info.update(
-                        {
-                            "score": score,
-                            "root_pc": root_pc_candidate,
-                            "chord_type": chord_type_def,
-                            "chord_desc": desc_name_def,
-                            "defined_intervals": defined_intervals_def,
-                            "matched_defined_intervals": intersection,
-                            "extra_played_pcs_rel_to_root": relative_played_pcs
-                            - defined_intervals_def,
-                        }
-                    )
-                elif score == best_match_info["score"] and score > 0:
-                    current_match_strength = (
-                        len(intersection) + len(defined_intervals_def) * 0.1
-                    )
-                    prev_match_strength = (
-                        len(best_match_info["matched_defined_intervals"])
-                        + len(best_match_info["defined_intervals"]) * 0.1
-                    )
-                    if current_match_strength > prev_match_strength:
-                        best_match_info.update(
-                            {
-                                "score": score,
-                                "root_pc": root_pc_candidate,
-                                "chord_type": chord_type_def,
-                                "chord_desc": desc_name_def,
-                                "defined_intervals": defined_intervals_def,
-                                "matched_defined_intervals": intersection,
-                                "extra_played_pcs_rel_to_root": relative_played_pcs
-                                - defined_intervals_def,
-                            }
-                        )
-
-        if best_match_info["score"] < MIN_ACCEPTABLE_CHORD_SCORE:
+        match = cls._recognize_by_mask(played_mask)
+        if match is None:
             return None
-
-        recognized_root_pc = best_match_info["root_pc"]
-        root_name = cls.midi_to_pitch_class_name(recognized_root_pc)
+        (
+            best_score,
+            recognized_root_pc,
+            chord_type_name,
+            chord_desc,
+            best_defined_mask,
+        ) = match
+
+        # Both values are already pitch classes, so index the name table directly
+        pc_names = cls.NOTE_PITCH_CLASSES
+        root_name = pc_names[recognized_root_pc]
         actual_bass_pc = lowest_midi_note % 12
-        actual_bass_name = cls.midi_to_pitch_class_name(actual_bass_pc)
-        chord_type_name = best_match_info["chord_type"]
+        actual_bass_name = pc_names[actual_bass_pc]
         full_chord_name = f"{root_name}{chord_type_name}"
         inversion_text = "Root Position"
         bass_interval_rel_to_root = (actual_bass_pc - recognized_root_pc + 12) % 12
-        sorted_defined_intervals = sorted(list(best_match_info["defined_intervals"]))
+        sorted_defined_intervals = pc_mask_to_list(best_defined_mask)
+        played_mask_rel_to_root = rotate_pc_mask(played_mask, -recognized_root_pc)
 
         if bass_interval_rel_to_root != 0:
             full_chord_name += f"/{actual_bass_name}"
-            try:
-                inversion_index = sorted_defined_intervals.index(
-                    bass_interval_rel_to_root
-                )
+            if (best_defined_mask >> bass_interval_rel_to_root) & 1:
+                # Position of the bass among the chord's ascending tones = tones below it
+                inversion_index = _POPCOUNT_12[
+                    best_defined_mask & ((1 << bass_interval_rel_to_root) - 1)
+                ]
                 if inversion_index == 1:
                     inversion_text = "1st Inversion"
                 elif inversion_index == 2:
@@ -285,36 +432,31 @@ class ChordTheory:
                     inversion_text = "3rd Inversion"
                 else:
                     inversion_text = f"Inversion (bass is {inversion_index+1}th tone)"
-            except ValueError:
-                inversion_text = "Slash Chord (bass not a core tone of root chord)"
-
-        octave_span = (sorted_played_midi_notes[-1] - lowest_midi_note) / 12.0
-        voicing_density_text = "N/A"
-        if len(sorted_played_midi_notes) >= 2:
-            if len(sorted_played_midi_notes) == 2:
-                voicing_density_text = "Interval"
-            elif octave_span < 1.0:
-                voicing_density_text = "Very Close Voicing"
-            elif octave_span < 1.5:
-                voicing_density_text = "Close Voicing"
-            elif octave_span < 2.5:
-                voicing_density_text = "Moderately Open Voicing"
             else:
-                voicing_density_text = "Very Open (Spread) Voicing"
+                inversion_text = "Slash Chord (bass not a core tone of root chord)"
 
-        intervals_from_actual_bass = sorted(
-            list(
-                frozenset(
-                    (pc - actual_bass_pc + 12) % 12 for pc in played_pitch_classes
-                )
-            )
+        span_semitones = sorted_played_midi_notes[-1] - lowest_midi_note
+        octave_span = span_semitones / 12.0
+        played_note_count = len(sorted_played_midi_notes)
+        if played_note_count > 2:
+            voicing_density_text = _VOICING_DENSITY_BY_SPAN[
+                min(span_semitones, len(_VOICING_DENSITY_BY_SPAN) - 1)
+            ]
+        elif played_note_count == 2:
+            voicing_density_text = "Interval"
+        else:
+            voicing_density_text = "N/A"
+
+        intervals_from_actual_bass = pc_mask_to_list(
+            rotate_pc_mask(played_mask, -actual_bass_pc)
         )
 
+        root_pc_bit = 1 << recognized_root_pc
         played_root_midi_note = next(
             (
                 note
                 for note in sorted_played_midi_notes
-                if note % 12 == recognized_root_pc
+                if _MIDI_NOTE_PC_BITS[note] == root_pc_bit
             ),
             None,
         )
@@ -328,17 +470,20 @@ class ChordTheory:
             "bass_note_pc": actual_bass_pc,
             "bass_note_name": actual_bass_name,
             "chord_type": chord_type_name,
-            "chord_description": best_match_info["chord_desc"],
+            "chord_description": chord_desc,
             "inversion_type": inversion_text,
-            "score": round(best_match_info["score"], 3),
+            "score": round(best_score, 3),
             "played_notes_midi": sorted_played_midi_notes,
-            "played_pitch_classes": sorted(list(played_pitch_classes)),
+            "played_pitch_classes": pc_mask_to_list(played_mask),
             "defined_intervals_of_matched_chord": sorted_defined_intervals,
-            "matched_defined_intervals_rel_to_root": sorted(list(best_match_info["matched_defined_intervals"])),
-            "extra_played_intervals_rel_to_root": sorted(list(best_match_info["extra_played_pcs_rel_to_root"])),
-            "all_played_intervals_rel_to_root": sorted(list((pc - recognized_root_pc + 12) % 12 for pc in played_pitch_classes)),
+            "matched_defined_intervals_rel_to_root": pc_mask_to_list(played_mask_rel_to_root & best_defined_mask),
+            "extra_played_intervals_rel_to_root": pc_mask_to_list(played_mask_rel_to_root & ~best_defined_mask),
+            "all_played_intervals_rel_to_root": pc_mask_to_list(played_mask_rel_to_root),
             "octave_span_played_notes": round(octave_span, 2),
             "voicing_density_description": voicing_density_text,
             "intervals_from_actual_bass_pc": intervals_from_actual_bass,
         }
         return result
+
+
+ChordTheory._compile_chord_masks()
@@ -3,7 +3,7 @@ from PyQt6.QtWidgets import (
     QApplication
 )
 
-from ui.main_window import ChordAppMainWindow
+from ui.main_window import APP_STYLESHEET, ChordAppMainWindow
 
 
 
@@ -11,13 +11,8 @@ if __name__ == '__main__':
     
     app = QApplication(sys.argv)
     
-    # Load and apply a QSS stylesheet for a more modern look (optional)
-    # You can create a "style.qss" file or embed it.
-    # try:
-    #     with open("style.qss", "r") as f:
-    #         app.setStyleSheet(f.read())
-    # except FileNotFoundError:
-    #     print("style.qss not found, using default styles.")
+    # Apply the stylesheet once, application-wide, before any widget is created
+    app.setStyleSheet(APP_STYLESHEET)
 
     main_window = ChordAppMainWindow()
     main_window.show()
@@ -23,7 +23,7 @@ a = Analysis(
     datas=datas,
     hookspath=[],
     runtime_hooks=[],
-    excludes=[],
+    excludes=['PyQt5', 'PySide2', 'PySide6', 'tkinter'],  # the app only uses PyQt6
     win_no_prefer_redirects=False,
     win_private_assemblies=False,
     cipher=block_cipher,
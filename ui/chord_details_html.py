@@ -0,0 +1,34 @@
+# --- Chord Details HTML (Qt-free, so it can run on the recognizer thread) ---
+from core.music_theory import ChordTheory
+
+# Display labels for every MIDI note, e.g. "C4(60)", and names for every interval
+_MIDI_NOTE_LABELS = tuple(f"{ChordTheory.midi_to_pitch_class_name(n)}{n//12 - 1}({n})" for n in range(128))
+_INTERVAL_NAMES = tuple(ChordTheory.interval_to_name(i) for i in range(12))
+_EXT_INTERVAL_NAMES = tuple(ChordTheory.interval_to_name(i, use_extended_names=True) for i in range(12))
+
+
+def format_chord_details_html(chord_data: dict) -> str:
+    html_content = ""
+    notes_midi = chord_data.get('played_notes_midi', [])
+    if notes_midi:
+        note_names = [_MIDI_NOTE_LABELS[n] for n in notes_midi] # C4(60)
+        html_content += f"<p><b>Played Notes:</b> {', '.join(note_names)}</p>"
+
+    if chord_data.get('full_chord_name', "N.C.") != "N.C.":
+        pcs = chord_data.get('played_pitch_classes', [])
+        html_content += f"<p><b>Pitch Classes:</b> {pcs}</p>"
+
+        all_rel_root = chord_data.get('all_played_intervals_rel_to_root', [])
+        all_rel_root_names = [_EXT_INTERVAL_NAMES[i] for i in all_rel_root]
+        html_content += f"<p><b>Intervals (from Root {chord_data.get('root_note_name', '')}):</b> {all_rel_root} <i>({', '.join(all_rel_root_names)})</i></p>"
+
+        extra_rel_root = chord_data.get('extra_played_intervals_rel_to_root', [])
+        if extra_rel_root:
+            extra_names = [_EXT_INTERVAL_NAMES[i] for i in extra_rel_root]
+            html_content += f"<p><b>Extra Intervals (from Root):</b> {extra_rel_root} <i>({', '.join(extra_names)})</i></p>"
+
+        intervals_from_bass = chord_data.get('intervals_from_actual_bass_pc', [])
+        intervals_from_bass_names = [_INTERVAL_NAMES[i] for i in intervals_from_bass]
+        html_content += f"<p><b>Intervals (from Bass {chord_data.get('bass_note_name', '')}):</b> {intervals_from_bass} <i>({', '.join(intervals_from_bass_names)})</i></p>"
+
+    return f"<div>{html_content}</div>"
@@ -1,14 +1,16 @@
 import sys
-from typing import Dict, Optional
+import time
+from typing import Dict, List, Optional, Tuple
 import mido
 from PyQt6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QComboBox, QLabel, QGridLayout, QFrame, QSizePolicy, QTextEdit
 )
-from PyQt6.QtCore import Qt, QTimer
+from PyQt6.QtCore import Qt, QEvent, QSignalBlocker, QTimer, pyqtSignal
 from PyQt6.QtGui import QFont
 
  
 
+from ui.chord_details_html import format_chord_details_html
 from ui.piano_keyboard_window import PianoKeyboardWidget
 from ui.workers.midi_worker import MIDIWorkerThread
 
@@ -16,15 +18,90 @@ from ui.workers.midi_worker import MIDIWorkerThread
 # and we can import MIDIChordRecognizer and ChordTheory from it.
 # If not, you'd copy those classes here or adjust imports.
 try:
-    from core.chord_recognition_engine import MIDIChordRecognizer, ChordTheory, DEFAULT_CHORD_CONFIG_PATH
+    from core.chord_recognition_engine import DEFAULT_CHORD_CONFIG_PATH
 except ImportError:
     print("ERROR: Could not import 'midi_recognizer_engine'. Make sure it's in the same directory or Python path.")
     print("You might need to copy the MIDIChordRecognizer and ChordTheory classes here.")
     sys.exit(1)
 
 
+# --- Styling ---
+# Applied once to the QApplication by midi_chord_app.py, so it is parsed a single time and
+# inherited by every widget; state colours use property selectors instead of restyling.
+APP_STYLESHEET = """
+    QMainWindow {
+        background-color: #2E2E2E; /* Dark gray background */
+    }
+    QLabel {
+        color: #E0E0E0; /* Light gray text */
+        font-size: 11pt;
+    }
+    QComboBox {
+        font-size: 10pt;
+        padding: 5px;
+    }
+    QFrame#chordDisplayFrame {
+        border: 1px solid #555555;
+        border-radius: 5px;
+        background-color: #3A3A3A;
+    }
+    QLabel#chordNameLabel {
+        font-size: 32pt;
+        font-weight: bold;
+        color: #4CAF50; /* Green for chord name */
+        padding: 10px;
+        border-bottom: 1px solid #555555;
+    }
+    QLabel#chordNameLabel[chordState="recognized"] {
+        color: #4CAF50; /* Green for recognized chord */
+    }
+    QLabel#chordNameLabel[chordState="idle"] {
+        color: #E0E0E0; /* Default color for N.C. */
+    }
+    QLabel#statusLabel {
+        font-size: 9pt;
+        color: #AAAAAA;
+    }
+    QTextEdit#detailsTextEdit {
+        background-color: #333333;
+        color: #D0D0D0;
+        border: 1px solid #444444;
+        font-family: Consolas, Courier New, monospace;
+        font-size: 10pt;
+    }
+"""
+
+MIDI_PORT_SCAN_INTERVAL_MS = 30000 # Background hot-plug check; opening the port list also rescans
+CHORD_RENDER_INTERVAL_MS = 30 # At most one chord render per interval (~33 Hz)
+MIDI_PORT_LIST_MAX_AGE = 1.0 # Seconds a port enumeration is reused by back-to-back scans
+
+_midi_port_list_cache: Tuple[float, List[str]] = (float("-inf"), [])
+
+
+def _get_midi_input_names(max_age: float = MIDI_PORT_LIST_MAX_AGE) -> List[str]:
+    global _midi_port_list_cache
+    fetched_at, ports = _midi_port_list_cache
+    now = time.monotonic()
+    if now - fetched_at >= max_age:
+        ports = mido.get_input_names()
+        _midi_port_list_cache = (now, ports)
+    return list(ports)
+
+
+class MIDIPortComboBox(QComboBox):
+    popup_about_to_show = pyqtSignal()
+
+    def showPopup(self):
+        self.popup_about_to_show.emit() # Lets the window refresh the port list first
+        super().showPopup()
+
+
 # --- Main Application Window ---
 class ChordAppMainWindow(QMainWindow):
+    # Values of the chord name label's "chordState" property, styled in APP_STYLESHEET
+    CHORD_NAME_STATE_RECOGNIZED = "recognized"
+    CHORD_NAME_STATE_IDLE = "idle"
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Real-time MIDI Chord Display")
@@ -32,44 +109,14 @@ class ChordAppMainWindow(QMainWindow):
 
         self.recognizer_thread: Optional[MIDIWorkerThread] = None
         self.piano_keyboard_widget: Optional[PianoKeyboardWidget] = None
-
-        # --- Styling ---
-        self.setStyleSheet("""
-            QMainWindow {
-                background-color: #2E2E2E; /* Dark gray background */
-            }
-            QLabel {
-                color: #E0E0E0; /* Light gray text */
-                font-size: 11pt;
-            }
-            QComboBox {
-                font-size: 10pt;
-                padding: 5px;
-            }
-            QFrame#chordDisplayFrame {
-                border: 1px solid #555555;
-                border-radius: 5px;
-                background-color: #3A3A3A;
-            }
-            QLabel#chordNameLabel {
-                font-size: 32pt;
-                font-weight: bold;
-                color: #4CAF50; /* Green for chord name */
-                padding: 10px;
-                border-bottom: 1px solid #555555;
-            }
-            QLabel#statusLabel {
-                font-size: 9pt;
-                color: #AAAAAA;
-            }
-            QTextEdit#detailsTextEdit {
-                background-color: #333333;
-                color: #D0D0D0;
-                border: 1px solid #444444;
-                font-family: Consolas, Courier New, monospace;
-                font-size: 10pt;
-            }
-        """)
+        # State currently applied to the chord name label; it is only re-polished on change
+        self._chord_name_state: Optional[str] = None
+        # Port names from the last backend scan; the combo box lists them in this order
+        self._known_midi_ports: Tuple[str, ...] = ()
+        # HTML currently shown in the details box; setHtml re-parses, so it is skipped when equal
+        self._details_html = ""
+        # Text last written to each chord label, so unchanged fields skip setText
+        self._label_texts: Dict[QLabel, str] = {}
 
         self.central_widget = QWidget()
         self.setCentralWidget(self.central_widget)
@@ -78,16 +125,26 @@ class ChordAppMainWindow(QMainWindow):
         self._setup_ui()
         self._populate_midi_ports()
 
-        # Timer to periodically check for new MIDI ports (e.g., if a device is plugged in later)
+        # Timer to periodically check for new MIDI ports (e.g., if a device is plugged in later).
+        # Ports are also rescanned whenever the user opens the list, so this can be infrequent.
         self.port_scan_timer = QTimer(self)
         self.port_scan_timer.timeout.connect(self._check_and_repopulate_midi_ports)
-        self.port_scan_timer.start(5000) # Check every 5 seconds
+        self.port_scan_timer.start(MIDI_PORT_SCAN_INTERVAL_MS)
+
+        # Chord updates render immediately when idle; bursts keep only the newest chord,
+        # which is rendered when the interval ends.
+        self._pending_chord_data: Optional[dict] = None
+        self._chord_render_timer = QTimer(self)
+        self._chord_render_timer.setSingleShot(True)
+        self._chord_render_timer.setInterval(CHORD_RENDER_INTERVAL_MS)
+        self._chord_render_timer.timeout.connect(self._flush_pending_chord)
 
     def _setup_ui(self):
         # MIDI Port Selection
-        self.midi_port_combo = QComboBox()
+        self.midi_port_combo = MIDIPortComboBox()
         self.midi_port_combo.setPlaceholderText("Select MIDI Input Device")
         self.midi_port_combo.activated.connect(self.on_midi_port_selected) # Use activated for user selection
+        self.midi_port_combo.popup_about_to_show.connect(self._repopulate_midi_ports_if_changed)
         self.layout.addWidget(self.midi_port_combo)
 
         # Chord Display Area
@@ -103,7 +160,8 @@ class ChordAppMainWindow(QMainWindow):
 
         # Grid for detailed info
         self.details_grid_layout = QGridLayout()
-        self.details_labels: Dict[str, QLabel] = {}
+        # Value labels in display order; each is also kept as a <key>_value_label attribute
+        self.detail_value_labels: List[QLabel] = []
         
         details_to_show = [
             ("Root:", "---"), ("Bass:", "---"), ("Type:", "---"),
@@ -116,7 +174,8 @@ class ChordAppMainWindow(QMainWindow):
             lbl = QLabel(label_text)
             val_lbl = QLabel(val_text)
             val_lbl.setFont(QFont("Segoe UI", 10, QFont.Weight.Bold)) # Make value bold
-            self.details_labels[label_text.replace(":", "").lower().replace(" ", "_")] = val_lbl
+            setattr(self, f"{label_text.replace(':', '').lower().replace(' ', '_')}_value_label", val_lbl)
+            self.detail_value_labels.append(val_lbl)
             self.details_grid_layout.addWidget(lbl, row, 0)
             self.details_grid_layout.addWidget(val_lbl, row, 1)
             row +=1
@@ -151,39 +210,54 @@ class ChordAppMainWindow(QMainWindow):
         # self.layout.addWidget(piano_placeholder)
 
 
-    def _populate_midi_ports(self, selected_port_name: Optional[str] = None):
+    def _populate_midi_ports(self, selected_port_name: Optional[str] = None, ports: Optional[List[str]] = None):
         current_selection = selected_port_name if selected_port_name else self.midi_port_combo.currentText()
-        self.midi_port_combo.blockSignals(True) # Avoid triggering signal during repopulation
-        self.midi_port_combo.clear()
-        self.midi_port_combo.addItem("Select MIDI Input Device")
+        # Avoid triggering signals during repopulation; released when the blocker goes away
+        signal_blocker = QSignalBlocker(self.midi_port_combo)
+        if self.midi_port_combo.count() == 0:
+            self.midi_port_combo.addItem("Select MIDI Input Device")
+        self._known_midi_ports = ()
         try:
-            ports = mido.get_input_names()
-            if ports:
-                self.midi_port_combo.addItems(ports)
-                if current_selection and current_selection in ports:
-                    self.midi_port_combo.setCurrentText(current_selection)
-                elif selected_port_name and selected_port_name in ports: # If a specific port was requested
-                     self.midi_port_combo.setCurrentText(selected_port_name)
-            else:
+            if ports is None: # Callers that just listed the ports pass them in
+                ports = _get_midi_input_names()
+            self._known_midi_ports = tuple(ports)
+            if not ports:
                 self.status_label.setText("No MIDI input devices found.")
         except Exception as e:
+            ports = []
             self.status_label.setText(f"Error listing MIDI ports: {e}")
             print(f"Error listing MIDI ports: {e}")
-        self.midi_port_combo.blockSignals(False)
+
+        # Edit the rows in place: drop ports that went away, insert new ones at their backend
+        # position (row 0 is the placeholder), so the rows keep the backend order
+        for index in range(self.midi_port_combo.count() - 1, 0, -1):
+            if self.midi_port_combo.itemText(index) not in ports:
+                self.midi_port_combo.removeItem(index)
+        listed_ports = {self.midi_port_combo.itemText(i) for i in range(1, self.midi_port_combo.count())}
+        for backend_index, port in enumerate(ports):
+            if port not in listed_ports:
+                self.midi_port_combo.insertItem(backend_index + 1, port)
+
+        if current_selection and current_selection in ports:
+            self.midi_port_combo.setCurrentText(current_selection)
+        else:
+            self.midi_port_combo.setCurrentIndex(0)
+        signal_blocker.unblock()
 
     def _check_and_repopulate_midi_ports(self):
         # Only repopulate if the recognizer is not active or if the port list changed
         if self.recognizer_thread and self.recognizer_thread.isRunning():
             return 
+        self._repopulate_midi_ports_if_changed()
 
-        current_ports_in_combo = [self.midi_port_combo.itemText(i) for i in range(1, self.midi_port_combo.count())]
+    def _repopulate_midi_ports_if_changed(self):
         try:
-            actual_ports = mido.get_input_names()
-            if set(current_ports_in_combo) != set(actual_ports):
+            actual_ports = _get_midi_input_names()
+            if tuple(actual_ports) != self._known_midi_ports:
                 self.status_label.setText("MIDI port list changed. Repopulating...")
-                self._populate_midi_ports()
+                self._populate_midi_ports(ports=actual_ports)
         except Exception as e:
-            print(f"Error during periodic MIDI port check: {e}")
+            print(f"Error during MIDI port check: {e}")
 
 
     def on_midi_port_selected(self, index: int):
@@ -198,11 +272,13 @@ class ChordAppMainWindow(QMainWindow):
         self.status_label.setText(f"Selected MIDI port: {port_name}. Starting recognizer...")
 
         if self.recognizer_thread and self.recognizer_thread.isRunning():
+            # Keep the running worker and recognizer; only the input port is reopened
+            self._reset_chord_display()
+            if self.recognizer_thread.switch_port(port_name):
+                return
+            # The recognizer was not up yet (or the switch failed): restart the worker
             self.recognizer_thread.stop_recognizer()
-            # Give it a moment to fully stop before starting a new one
-            QTimer.singleShot(200, lambda: self._start_recognizer_for_port(port_name))
-        else:
-            self._start_recognizer_for_port(port_name)
+        self._start_recognizer_for_port(port_name)
 
     def _start_recognizer_for_port(self, port_name: str):
         self.recognizer_thread = MIDIWorkerThread(
@@ -211,9 +287,9 @@ class ChordAppMainWindow(QMainWindow):
             buffer_time=0.015 # Or from an app setting
         )
         self.recognizer_thread.set_midi_port(port_name)
-        self.recognizer_thread.signals.chord_updated.connect(self.update_chord_display)
+        self.recognizer_thread.signals.chord_available.connect(self._on_chord_available)
         self.recognizer_thread.signals.midi_ports_listed.connect(
-            lambda ports: self._populate_midi_ports(selected_port_name=port_name if port_name in ports else None)
+            lambda ports: self._populate_midi_ports(selected_port_name=port_name if port_name in ports else None, ports=ports)
         ) # If it lists ports, repopulate
         self.recognizer_thread.signals.recognizer_status.connect(
             lambda status_msg: self.status_label.setText(status_msg)
@@ -225,70 +301,89 @@ class ChordAppMainWindow(QMainWindow):
 
 
     def _reset_chord_display(self):
-        self.chord_name_label.setText("N.C.")
-        self.chord_name_label.setStyleSheet("color: #E0E0E0;") # Reset color
+        self._chord_render_timer.stop()
+        self._pending_chord_data = None
+        self._set_label_text(self.chord_name_label, "N.C.")
+        self._set_chord_name_state(self.CHORD_NAME_STATE_IDLE) # Reset color
         
         default_val = "---"
-        self.details_labels["root"].setText(default_val)
-        self.details_labels["bass"].setText(default_val)
-        self.details_labels["type"].setText(default_val)
-        self.details_labels["inversion"].setText(default_val)
-        self.details_labels["score"].setText(default_val)
-        self.details_labels["voicing"].setText(default_val)
-        self.details_labels["octave_span"].setText(default_val)
+        for value_label in self.detail_value_labels:
+            self._set_label_text(value_label, default_val)
+        self._details_html = ""
         self.details_text_edit.setHtml("")
 
         if self.piano_keyboard_widget:
             self.piano_keyboard_widget.update_active_notes([]) # Clear all pressed keys
 
 
+    def _set_label_text(self, label: QLabel, text: str):
+        if self._label_texts.get(label) != text:
+            self._label_texts[label] = text
+            label.setText(text)
+
+    def _set_chord_name_state(self, state: str):
+        if state != self._chord_name_state:
+            self._chord_name_state = state
+            self.chord_name_label.setProperty("chordState", state)
+            # Re-polish so the property selectors in the application stylesheet are re-evaluated
+            label_style = self.chord_name_label.style()
+            label_style.unpolish(self.chord_name_label)
+            label_style.polish(self.chord_name_label)
+
+    def _on_chord_available(self):
+        chord_data = self.recognizer_thread.take_latest_chord() if self.recognizer_thread else None
+        if chord_data is not None:
+            self._on_chord_updated(chord_data)
+
+    def _on_chord_updated(self, chord_data: dict):
+        # While minimized nothing is drawn, so only keep the newest chord for the restore
+        if self._chord_render_timer.isActive() or self.isMinimized():
+            self._pending_chord_data = chord_data
+            return
+        self.update_chord_display(chord_data)
+        self._chord_render_timer.start()
+
+    def changeEvent(self, event):
+        super().changeEvent(event)
+        if event.type() == QEvent.Type.WindowStateChange and not self.isMinimized():
+            self._flush_pending_chord() # Show the chord held back while minimized
+
+    def _flush_pending_chord(self):
+        if self._pending_chord_data is not None and not self.isMinimized():
+            chord_data, self._pending_chord_data = self._pending_chord_data, None
+            self.update_chord_display(chord_data)
+            self._chord_render_timer.start()
+
     def update_chord_display(self, chord_data: dict):
         #print(f"UI received chord data: {chord_data}") # For debugging
         
         full_name = chord_data.get('full_chord_name', "N.C.")
-        self.chord_name_label.setText(full_name)
+        self._set_label_text(self.chord_name_label, full_name)
         
         if full_name != "N.C." and chord_data.get('score', 0) > 0:
-            self.chord_name_label.setStyleSheet("color: #4CAF50;") # Green for recognized chord
+            self._set_chord_name_state(self.CHORD_NAME_STATE_RECOGNIZED)
         else:
-            self.chord_name_label.setStyleSheet("color: #E0E0E0;") # Default color for N.C.
+            self._set_chord_name_state(self.CHORD_NAME_STATE_IDLE)
 
-        self.details_labels["root"].setText(chord_data.get('root_note_name', "---"))
-        self.details_labels["bass"].setText(chord_data.get('bass_note_name', "---"))
-        self.details_labels["type"].setText(chord_data.get('chord_type', "---"))
-        self.details_labels["inversion"].setText(chord_data.get('inversion_type', "---"))
+        self._set_label_text(self.root_value_label, chord_data.get('root_note_name', "---"))
+        self._set_label_text(self.bass_value_label, chord_data.get('bass_note_name', "---"))
+        self._set_label_text(self.type_value_label, chord_data.get('chord_type', "---"))
+        self._set_label_text(self.inversion_value_label, chord_data.get('inversion_type', "---"))
         
         score = chord_data.get('score', 0.0)
-        self.details_labels["score"].setText(f"{score:.2f}" if score > 0 else "---")
+        self._set_label_text(self.score_value_label, f"{score:.2f}" if score > 0 else "---")
         
-        self.details_labels["voicing"].setText(chord_data.get('voicing_density_description', "---"))
-        self.details_labels["octave_span"].setText(str(chord_data.get('octave_span_played_notes', "---")))
+        self._set_label_text(self.voicing_value_label, chord_data.get('voicing_density_description', "---"))
+        self._set_label_text(self.octave_span_value_label, str(chord_data.get('octave_span_played_notes', "---")))
 
         # --- Populate TextEdit with more details ---
-        html_content = ""
-        notes_midi = chord_data.get('played_notes_midi', [])
-        if notes_midi:
-            note_names = [f"{ChordTheory.midi_to_pitch_class_name(n)}{n//12 - 1}({n})" for n in notes_midi] # C4(60)
-            html_content += f"<p><b>Played Notes:</b> {', '.join(note_names)}</p>"
-        
-        if full_name != "N.C.":
-            pcs = chord_data.get('played_pitch_classes', [])
-            html_content += f"<p><b>Pitch Classes:</b> {pcs}</p>"
-            
-            all_rel_root = chord_data.get('all_played_intervals_rel_to_root', [])
-            all_rel_root_names = [ChordTheory.interval_to_name(i, use_extended_names=True) for i in all_rel_root]
-            html_content += f"<p><b>Intervals (from Root {chord_data.get('root_note_name', '')}):</b> {all_rel_root} <i>({', '.join(all_rel_root_names)})</i></p>"
-
-            extra_rel_root = chord_data.get('extra_played_intervals_rel_to_root', [])
-            if extra_rel_root:
-                extra_names = [ChordTheory.interval_to_name(i, use_extended_names=True) for i in extra_rel_root]
-                html_content += f"<p><b>Extra Intervals (from Root):</b> {extra_rel_root} <i>({', '.join(extra_names)})</i></p>"
-
-            intervals_from_bass = chord_data.get('intervals_from_actual_bass_pc', [])
-            intervals_from_bass_names = [ChordTheory.interval_to_name(i) for i in intervals_from_bass]
-            html_content += f"<p><b>Intervals (from Bass {chord_data.get('bass_note_name', '')}):</b> {intervals_from_bass} <i>({', '.join(intervals_from_bass_names)})</i></p>"
-
-        self.details_text_edit.setHtml(f"<div>{html_content}</div>")
+        # The worker pre-formats this on the recognizer thread; format here only as a fallback
+        details_html = chord_data.get('details_html')
+        if details_html is None:
+            details_html = format_chord_details_html(chord_data)
+        if details_html != self._details_html:
+            self._details_html = details_html
+            self.details_text_edit.setHtml(details_html)
 
         # Update Piano Keyboard
         if self.piano_keyboard_widget:
@@ -298,6 +393,7 @@ class ChordAppMainWindow(QMainWindow):
 
     def closeEvent(self, event):
         self.port_scan_timer.stop()
+        self._chord_render_timer.stop()
         if self.recognizer_thread and self.recognizer_thread.isRunning():
             self.status_label.setText("Closing... Stopping recognizer thread.")
             self.recognizer_thread.stop_recognizer()
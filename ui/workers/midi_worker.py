@@ -1,10 +1,12 @@
 # --- QThread for running the MIDI Recognizer ---
+import threading
 from typing import Optional
 
 from PyQt6.QtCore import QThread
 
 import mido
 from core.chord_recognition_engine import MIDIChordRecognizer
+from ui.chord_details_html import format_chord_details_html
 from ui.workers.recognizer_signal import RecognizerSignals
 
 
@@ -19,10 +21,49 @@ class MIDIWorkerThread(QThread):
         self._min_notes = min_notes
         self._buffer_time = buffer_time
         self._running = False
+        # Single-slot handoff to the GUI: only the newest chord is kept, so a stalled GUI
+        # never builds a backlog of queued chord events.
+        self._latest_chord_data: Optional[dict] = None
+        self._chord_slot_lock = threading.Lock()
+        # Held while the recognizer is switched to another port, so run() does not take
+        # the brief restart of the recognizer's MIDI thread for a shutdown.
+        self._port_switch_lock = threading.Lock()
 
     def set_midi_port(self, port_name: Optional[str]):
         self.selected_midi_port = port_name
 
+    def switch_port(self, port_name: str) -> bool:
+        # Reuse the running recognizer: only the input port is reopened
+        with self._port_switch_lock:
+            if not (self._running and self.recognizer and self.recognizer.running):
+                return False
+            self.selected_midi_port = port_name
+            # Drop any chord left pending by the old port, after its thread has been
+            # joined but before the new port's thread can publish
+            switched = self.recognizer.switch_midi_port(
+                port_name, on_input_stopped=self.take_latest_chord
+            )
+        if switched:
+            self.signals.recognizer_status.emit(f"Recognizer switched to {port_name}.")
+        else:
+            self.signals.recognizer_status.emit(f"Failed to open MIDI port {port_name}.")
+        return switched
+
+    def _emit_chord_update(self, chord_data: dict):
+        # Called on the recognizer's MIDI thread: build the details HTML here so the GUI
+        # thread only renders it. Copy, since the recognizer keeps chord_data for reuse.
+        display_data = dict(chord_data, details_html=format_chord_details_html(chord_data))
+        with self._chord_slot_lock:
+            wake_gui = self._latest_chord_data is None
+            self._latest_chord_data = display_data
+        if wake_gui: # Otherwise a wake-up is already queued and will pick up this chord
+            self.signals.chord_available.emit()
+
+    def take_latest_chord(self) -> Optional[dict]:
+        with self._chord_slot_lock:
+            chord_data, self._latest_chord_data = self._latest_chord_data, None
+        return chord_data
+
     def run(self):
         self._running = True
         self.signals.recognizer_status.emit(f"Worker thread started.")
@@ -48,48 +89,26 @@ class MIDIWorkerThread(QThread):
             chord_buffer_time_on=self._buffer_time,
             chord_config_path=self._config_path,
             use_zmq=False,  # << Explicitly disable ZMQ for UI instance
-            update_callback=self.signals.chord_updated.emit # << Pass the signal emitter
+            update_callback=self._emit_chord_update # << Formats details, then emits the signal
             
             
         )
         
-        # Override the recognizer's publish method to emit a signal instead
-        # This is a bit of a monkey-patch; a cleaner way would be to pass a callback
-        # or make the recognizer itself emit signals (if it were Qt-aware).
-        original_publish_method = self.recognizer._publish
-        def qt_publish_override(data_to_publish: dict):
-            self.signals.chord_updated.emit(data_to_publish)
-            # If you still want ZMQ publishing for other apps:
-            # original_publish_method(data_to_publish) 
-            # (but ensure ZMQ setup isn't conflicting or disable it in recognizer for this UI)
-            
-            # For this UI, we'll assume the recognizer's _publish does nothing or we replace it
-            # To prevent ZMQ from being used by this UI directly:
-            self.recognizer.zmq_socket = None # Disable ZMQ for this instance
-            
-        self.recognizer._publish = qt_publish_override
-        
-        # Also, need to disable ZMQ setup in the recognizer for this specific UI use case,
-        # or make it optional. For simplicity, we'll assume `_setup_zmq` can handle `self.zmq_socket` being None.
-        # A more robust way: add a `use_zmq=False` flag to MIDIChordRecognizer.__init__
-        
-        original_setup_zmq = self.recognizer._setup_zmq
-        def no_zmq_setup():
-            self.recognizer.zmq_context = None # Ensure no ZMQ setup
-            self.recognizer.zmq_socket = None
-            return True # Pretend ZMQ setup was successful
-        self.recognizer._setup_zmq = no_zmq_setup
-
-
-        if self.recognizer.start(): # This start will use the overridden _publish and _setup_zmq
+        if self.recognizer.start():
             self.signals.recognizer_status.emit(f"Recognizer started on {self.recognizer.midi_port_name if self.recognizer.midi_port else 'N/A'}.")
-            while self._running and self.recognizer.running:
-                # The recognizer's internal loop handles MIDI messages.
-                # This QThread loop just keeps the thread alive until stopped.
-                self.msleep(100) # Sleep to be responsive to _running flag
-            
-            if self.recognizer.running: # If loop exited due to self._running = False
-                 self.recognizer.stop()
+            # The recognizer's own thread handles MIDI messages; sleep until it ends, which
+            # stop_recognizer() causes (a port switch replaces it, so look it up again).
+            # The timeout only re-checks _running in case that thread cannot be unblocked.
+            while self._running:
+                with self._port_switch_lock:
+                    midi_thread = self.recognizer.midi_thread
+                    if not (midi_thread and midi_thread.is_alive()):
+                        break
+                midi_thread.join(timeout=1.0)
+
+            with self._port_switch_lock:
+                if self.recognizer.running: # If loop exited due to self._running = False
+                    self.recognizer.stop()
             self.signals.recognizer_status.emit("Recognizer stopped.")
         else:
             self.signals.recognizer_status.emit("Failed to start MIDI recognizer.")
@@ -98,8 +117,9 @@ class MIDIWorkerThread(QThread):
 
     def stop_recognizer(self):
         self._running = False
-        if self.recognizer:
-            self.recognizer.stop() # Tell the engine to stop
+        with self._port_switch_lock:
+            if self.recognizer:
+                self.recognizer.stop() # Tell the engine to stop
         self.quit() # Ask QThread to quit
         self.wait() # Wait for run() to finish
         self.signals.recognizer_status.emit("Worker thread stopped.")
@@ -2,6 +2,6 @@
 from PyQt6.QtCore import pyqtSignal, QObject
 
 class RecognizerSignals(QObject):
-    chord_updated = pyqtSignal(dict) # Emits the chord data dictionary
+    chord_available = pyqtSignal() # A new chord is waiting in MIDIWorkerThread.take_latest_chord()
     midi_ports_listed = pyqtSignal(list)
     recognizer_status = pyqtSignal(str)
\ No newline at end of file